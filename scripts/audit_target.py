@@ -10,13 +10,20 @@ whether a password was recovered.
 """
 from __future__ import annotations
 
+import argparse
 import json
+import os
 import shlex
 import shutil
 import subprocess
 import sys
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Sequence, Tuple
+
+try:  # pragma: no cover - optional dependency
+    import orjson  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    orjson = None
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -30,6 +37,17 @@ LOGS_DIR = REPO_ROOT / "logs"
 POTFILE_PATH = REPO_ROOT / "potfile.txt"
 
 
+def _rel(path: Path) -> str:
+    """Return ``path`` relative to the repository root, as used in commands."""
+
+    return str(path.relative_to(REPO_ROOT))
+
+
+RESULTS_REL = _rel(RESULTS_DIR)
+LOGS_REL = _rel(LOGS_DIR)
+POTFILE_REL = _rel(POTFILE_PATH)
+
+
 def prompt(message: str, *, default: Optional[str] = None) -> str:
     """Prompt the user and return the response (or default when empty)."""
 
@@ -48,22 +66,30 @@ def prompt(message: str, *, default: Optional[str] = None) -> str:
 
 
 def ensure_directories() -> None:
-    """Create directories required by the workflow."""
+    """Create directories required by the workflow (only those still missing)."""
 
     for path in (HASHES_DIR, WORDLISTS_DIR, LISTS_DIR, RULES_DIR, PLANS_DIR, RESULTS_DIR, LOGS_DIR):
-        path.mkdir(parents=True, exist_ok=True)
+        try:
+            os.stat(path)
+        except FileNotFoundError:
+            path.mkdir(parents=True, exist_ok=True)
 
 
 def parse_hash_info(hash_path: Path) -> Tuple[Optional[str], Optional[str]]:
-    """Attempt to extract the BSSID and SSID from a 22000 hash file."""
+    """Attempt to extract the BSSID and SSID from a 22000 hash file.
+
+    Only the first line is read, and it is split as raw bytes: multi-AP hash
+    files can be large and only the ESSID field ever needs decoding.
+    """
 
     try:
-        first_line = hash_path.read_text(encoding="utf-8", errors="ignore").splitlines()[0]
-    except (IndexError, FileNotFoundError):
+        with hash_path.open("rb") as handle:
+            first_line = handle.readline(4096)
+    except FileNotFoundError:
         return None, None
 
-    parts = first_line.split("*")
-    if len(parts) < 5 or parts[0] != "WPA":
+    parts = first_line.rstrip(b"\r\n").split(b"*")
+    if len(parts) < 5 or parts[0] != b"WPA":
         return None, None
 
     bssid_hex = parts[2].strip()
@@ -72,14 +98,15 @@ def parse_hash_info(hash_path: Path) -> Tuple[Optional[str], Optional[str]]:
     bssid = None
     if len(bssid_hex) == 12:
         try:
-            bssid = ":".join(bssid_hex[i : i + 2] for i in range(0, 12, 2)).lower()
+            h = bssid_hex.decode("ascii").lower()
+            bssid = f"{h[0:2]}:{h[2:4]}:{h[4:6]}:{h[6:8]}:{h[8:10]}:{h[10:12]}"
         except ValueError:
             bssid = None
 
     ssid = None
     if essid_hex:
         try:
-            ssid_bytes = bytes.fromhex(essid_hex)
+            ssid_bytes = bytes.fromhex(essid_hex.decode("ascii"))
             ssid = ssid_bytes.decode("utf-8", errors="ignore") or None
         except ValueError:
             ssid = None
@@ -121,122 +148,248 @@ def convert_capture(target_id: str, hash_path: Path) -> bool:
 
 def build_hashcat_command(
     stage_name: str,
-    hash_path: Path,
+    hash_path: str,
     attack_mode: str,
     args: Tuple[str, ...],
     *,
     target_id: str,
-    skip_message: Optional[str] = None,
-    required_files: Tuple[Path, ...] = (),
-) -> str:
-    """Create a shell command string that runs hashcat with project defaults."""
+    extra_flags: Tuple[str, ...] = (),
+) -> list[str]:
+    """Create the argv that runs hashcat with project defaults.
+
+    ``hash_path`` is already relative to the repository root (see :func:`_rel`).
+    ``extra_flags`` are inserted before the attack mode so stages can opt into
+    additional hashcat options (e.g. ``--slow-candidates``).  The optimized
+    kernel (``-O``) is always enabled: for ``-m 22000`` it keeps the 63
+    character WPA passphrase limit, so no valid candidate is truncated.
+    """
 
     session_name = f"{target_id}-{stage_name}"
-    outfile = RESULTS_DIR / target_id / f"{stage_name}.out"
-    logfile = LOGS_DIR / f"hashcat-{target_id}-{stage_name}.log"
+    outfile = f"{RESULTS_REL}/{target_id}/{stage_name}.out"
+    logfile = f"{LOGS_REL}/hashcat-{target_id}-{stage_name}.log"
 
     base_args = [
         "hashcat",
         "-m",
         "22000",
+        "-O",
+        "-w",
+        "4",
         "--session",
         session_name,
         "--status",
         "--status-timer",
         "30",
         "--potfile-path",
-        str(POTFILE_PATH.relative_to(REPO_ROOT)),
+        POTFILE_REL,
         "--logfile-path",
-        str(logfile.relative_to(REPO_ROOT)),
+        logfile,
         "--outfile",
-        str(outfile.relative_to(REPO_ROOT)),
+        outfile,
         "--outfile-format",
         "2,3,4,5",
         "--outfile-autohex-disable",
+        *extra_flags,
         "-a",
         attack_mode,
-        str(hash_path.relative_to(REPO_ROOT)),
+        hash_path,
     ]
     base_args.extend(args)
+    return base_args
 
-    command = " ".join(shlex.quote(str(arg)) for arg in base_args)
 
-    if required_files:
-        tests = " && ".join(
-            f"[ -f {shlex.quote(str(path.relative_to(REPO_ROOT)))} ]" for path in required_files
-        )
-        command = f"if {tests}; then {command};"
-        if skip_message:
-            command += f" else echo {shlex.quote(skip_message)} >&2; fi"
-        else:
-            command += " else exit 0; fi"
+def guard_command(
+    command: str,
+    required_files: Tuple[str, ...],
+    *,
+    skip_message: Optional[str] = None,
+) -> str:
+    """Wrap a shell ``command`` so it only runs when every required file exists."""
+
+    if not required_files:
+        return command
+    tests = " && ".join(f"[ -f {shlex.quote(path)} ]" for path in required_files)
+    command = f"if {tests}; then {command};"
+    if skip_message:
+        command += f" else echo {shlex.quote(skip_message)} >&2; fi"
+    else:
+        command += " else exit 0; fi"
     return command
 
 
-def create_plan(
+def build_candidate_pipeline(
+    stage_name: str,
+    hash_path: str,
+    wordlist: str,
+    rules_lite: Optional[str],
+    numbers_suffix: str,
+    smart_top: str,
+    *,
     target_id: str,
-    hash_path: Path,
-    bssid: str,
-    ssid: str,
-    channel: str,
-    time_window: str,
-    wordlist_path: Path,
-) -> dict[str, object]:
-    """Build the in-memory representation of the plan."""
+) -> str:
+    """Create a single hashcat run fed by the S1/S2/S3 candidate streams.
+
+    The candidates of the three legacy stages are generated on the host with
+    ``hashcat --stdout`` / ``cat`` and piped into one cracking session, so the
+    device initialisation and kernel compilation are only paid once.
+    """
+
+    dict_cmd = ["hashcat", "--stdout", wordlist]
+    if rules_lite:
+        dict_cmd.extend(["-r", rules_lite])
+    combinator_cmd = ["hashcat", "--stdout", "-a", "1", wordlist, numbers_suffix]
+    smart_cmd = ["cat", smart_top]
+
+    generators = [
+        guard_command(
+            " ".join(shlex.quote(arg) for arg in dict_cmd),
+            (wordlist,),
+            skip_message="Wordlist ciblée introuvable, candidats dictionnaire ignorés.",
+        ),
+        guard_command(
+            " ".join(shlex.quote(arg) for arg in combinator_cmd),
+            (wordlist, numbers_suffix),
+            skip_message="Wordlist ciblée ou numbers_suf.txt introuvable, candidats combinator ignorés.",
+        ),
+        guard_command(
+            " ".join(shlex.quote(arg) for arg in smart_cmd),
+            (smart_top,),
+            skip_message="Liste smart-top introuvable, candidats ignorés.",
+        ),
+    ]
+    cracker = build_hashcat_command(
+        stage_name,
+        hash_path,
+        "0",
+        (),
+        target_id=target_id,
+    )
+    return f"{{ {'; '.join(generators)}; }} | {shlex.join(cracker)}"
 
-    rules_lite = RULES_DIR / "rules-fr-lite.rule"
-    numbers_suffix = LISTS_DIR / "numbers_suf.txt"
-    smart_top = LISTS_DIR / "smart-top.txt"
+
+def legacy_stage_list(
+    target_id: str,
+    hash_path: str,
+    wordlist: str,
+    rules_lite: Optional[str],
+    numbers_suffix: str,
+    smart_top: str,
+) -> list[dict[str, object]]:
+    """Build the historical S1/S2/S3 stages, one hashcat run each.
+
+    Each stage carries an ``argv`` executed without a shell by run_plan.py and
+    the ``requires`` files that must exist for it to run.
+    """
 
     stages = []
 
-    dict_args = [str(wordlist_path.relative_to(REPO_ROOT))]
-    if rules_lite.exists():
-        dict_args.extend(["-r", str(rules_lite.relative_to(REPO_ROOT))])
+    dict_args = [wordlist]
+    dict_flags: Tuple[str, ...] = ()
+    if rules_lite:
+        dict_args.extend(["-r", rules_lite])
+        # WPA-PBKDF2 is a slow hash: generate rule candidates on the host so the
+        # GPU kernel is not starved by a tiny per-invocation keyspace.
+        dict_flags = ("--slow-candidates",)
     stage1 = {
         "name": "S1-dict-lite",
-        "cmd": build_hashcat_command(
+        "argv": build_hashcat_command(
             "S1-dict-lite",
             hash_path,
             "0",
             tuple(dict_args),
             target_id=target_id,
-            skip_message="Wordlist ciblée introuvable, étape ignorée.",
-            required_files=(wordlist_path,),
+            extra_flags=dict_flags,
         ),
+        "requires": [wordlist],
+        "skip_message": "Wordlist ciblée introuvable, étape ignorée.",
     }
     stages.append(stage1)
 
     stage2 = {
         "name": "S2-combinator",
-        "cmd": build_hashcat_command(
+        "argv": build_hashcat_command(
             "S2-combinator",
             hash_path,
             "1",
-            (
-                str(wordlist_path.relative_to(REPO_ROOT)),
-                str(numbers_suffix.relative_to(REPO_ROOT)),
-            ),
+            (wordlist, numbers_suffix),
             target_id=target_id,
-            skip_message="Wordlist ciblée ou numbers_suf.txt introuvable, étape combinator ignorée.",
-            required_files=(wordlist_path, numbers_suffix),
         ),
+        "requires": [wordlist, numbers_suffix],
+        "skip_message": "Wordlist ciblée ou numbers_suf.txt introuvable, étape combinator ignorée.",
     }
     stages.append(stage2)
 
     stage3 = {
         "name": "S3-smart-top",
-        "cmd": build_hashcat_command(
+        "argv": build_hashcat_command(
             "S3-smart-top",
             hash_path,
             "0",
-            (str(smart_top.relative_to(REPO_ROOT)),),
+            (smart_top,),
             target_id=target_id,
-            skip_message="Liste smart-top introuvable, étape ignorée.",
-            required_files=(smart_top,),
         ),
+        "requires": [smart_top],
+        "skip_message": "Liste smart-top introuvable, étape ignorée.",
     }
     stages.append(stage3)
+    return stages
+
+
+def create_plan(
+    target_id: str,
+    hash_path: Path,
+    bssid: str,
+    ssid: str,
+    channel: str,
+    time_window: str,
+    wordlist_path: Path,
+    *,
+    legacy_stages: bool = False,
+) -> dict[str, object]:
+    """Build the in-memory representation of the plan.
+
+    By default a single ``S1-pipeline`` stage cracks the merged candidate
+    stream; ``legacy_stages`` restores one hashcat run per attack.
+    """
+
+    rules_lite = RULES_DIR / "rules-fr-lite.rule"
+    numbers_suffix = LISTS_DIR / "numbers_suf.txt"
+    smart_top = LISTS_DIR / "smart-top.txt"
+
+    hash_rel = _rel(hash_path)
+    wordlist = _rel(wordlist_path)
+    rules_rel = _rel(rules_lite) if rules_lite.exists() else None
+    numbers_rel = _rel(numbers_suffix)
+    smart_rel = _rel(smart_top)
+
+    stages = []
+
+    if not legacy_stages:
+        stages.append(
+            {
+                "name": "S1-pipeline",
+                "cmd": build_candidate_pipeline(
+                    "S1-pipeline",
+                    hash_rel,
+                    wordlist,
+                    rules_rel,
+                    numbers_rel,
+                    smart_rel,
+                    target_id=target_id,
+                ),
+            }
+        )
+    else:
+        stages.extend(
+            legacy_stage_list(
+                target_id,
+                hash_rel,
+                wordlist,
+                rules_rel,
+                numbers_rel,
+                smart_rel,
+            )
+        )
 
     plan = {
         "version": "1.0",
@@ -271,8 +424,26 @@ def run_plan(plan_path: Path) -> int:
     return result.returncode
 
 
+def potfile_has_entries() -> bool:
+    """Return True when the potfile exists and is not empty."""
+
+    try:
+        return POTFILE_PATH.stat().st_size > 0
+    except FileNotFoundError:
+        return False
+
+
 def show_summary(hash_path: Path) -> None:
-    """Display a short summary based on hashcat --show output."""
+    """Display a short summary based on hashcat --show output.
+
+    ``hashcat --show`` (and its device initialisation) is skipped when the
+    potfile is missing or empty, as nothing can have been recovered then.
+    """
+
+    if not potfile_has_entries():
+        print("\n=== Résumé ===")
+        print("Aucun mot de passe trouvé pour le moment.")
+        return
 
     hashcat = shutil.which("hashcat")
     if hashcat is None:
@@ -282,6 +453,8 @@ def show_summary(hash_path: Path) -> None:
     cmd = [
         hashcat,
         "--show",
+        "--quiet",
+        "--machine-readable",
         "-m",
         "22000",
         str(hash_path),
@@ -304,7 +477,18 @@ def show_summary(hash_path: Path) -> None:
         print("Aucun mot de passe trouvé pour le moment.")
 
 
-def main() -> int:
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Audit interactif d'une cible WPA-PSK")
+    parser.add_argument(
+        "--legacy-stages",
+        action="store_true",
+        help="Lancer S1/S2/S3 comme trois exécutions hashcat distinctes",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
     ensure_directories()
 
     target_id = prompt(
@@ -353,13 +537,25 @@ def main() -> int:
         default="auto",
     )
 
-    plan = create_plan(target_id, hash_path, bssid, ssid, channel, time_window, wordlist_path)
+    plan = create_plan(
+        target_id,
+        hash_path,
+        bssid,
+        ssid,
+        channel,
+        time_window,
+        wordlist_path,
+        legacy_stages=args.legacy_stages,
+    )
 
     target_results_dir = RESULTS_DIR / target_id
     target_results_dir.mkdir(parents=True, exist_ok=True)
 
     plan_path = PLANS_DIR / f"{target_id}.yml"
-    plan_path.write_text(json.dumps(plan, indent=2), encoding="utf-8")
+    if orjson is not None:
+        plan_path.write_bytes(orjson.dumps(plan, option=orjson.OPT_INDENT_2))
+    else:
+        plan_path.write_text(json.dumps(plan, indent=2), encoding="utf-8")
     print(f"Plan écrit dans {plan_path}")
 
     rc = run_plan(plan_path)
@@ -1,19 +1,114 @@
 #!/usr/bin/env python3
-"""Append one JSON line to a file. Usage: log_json.py --file path key=value ..."""
+"""Append one JSON line to a file. Usage: log_json.py --file path key=value ...
+
+With ``--serve --socket PATH`` the script stays resident, receives one
+``key=value ...`` datagram per record (e.g. ``socat - UNIX-SENDTO:PATH``) and
+batches the appends.  ``--socket PATH key=value ...`` sends to that daemon and
+falls back to a direct append when it is not running.
+"""
 from __future__ import annotations
-import argparse, json, sys, datetime
+import argparse, json, os, shlex, signal, socket, sys, time
+
+try:  # pragma: no cover - optional dependency
+    import orjson  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    orjson = None
+
+BATCH_MAX = 64
+BATCH_DELAY = 0.005
+
+def dumps_line(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+_ts_second = -1
+_ts_prefix = ""
+
+def utc_ts() -> str:
+    """UTC timestamp like ``2024-07-01T09:00:00.123456Z``; date part cached per second."""
+    global _ts_second, _ts_prefix
+    ns = time.time_ns()
+    second, frac = divmod(ns, 1_000_000_000)
+    if second != _ts_second:
+        _ts_second = second
+        _ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+    return f"{_ts_prefix}.{frac // 1000:06d}Z"
+
+def make_record(kvs) -> dict:
+    record = {k: v for k, v in (kv.split("=", 1) for kv in kvs)}
+    if "ts" not in record:
+        record["ts"] = utc_ts()
+    return record
+
+def serve(path: str, sock_path: str) -> int:
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+    if os.path.exists(sock_path):
+        os.unlink(sock_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(sock_path)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            sock.settimeout(None)
+            batch = [sock.recv(65536)]
+            deadline = time.monotonic() + BATCH_DELAY
+            while len(batch) < BATCH_MAX:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    batch.append(sock.recv(65536))
+                except socket.timeout:
+                    break
+            lines = []
+            for data in batch:
+                try:
+                    lines.append(dumps_line(make_record(shlex.split(data.decode("utf-8", "replace")))))
+                except ValueError:  # malformed datagram, report it and keep serving
+                    print(f"log_json: ignoring malformed record {data!r}", file=sys.stderr)
+                    continue
+            if lines:
+                os.write(fd, b"".join(lines))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        sock.close()
+        os.close(fd)
+        if os.path.exists(sock_path):
+            os.unlink(sock_path)
+
+def send(sock_path: str, record: dict) -> bool:
+    """Send an already validated and stamped record to the daemon."""
+    data = " ".join(shlex.quote(f"{k}={v}") for k, v in record.items())
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.sendto(data.encode("utf-8"), sock_path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    return True
 
 def main() -> int:
     p = argparse.ArgumentParser()
     p.add_argument("--file", required=True)
+    p.add_argument("--socket", help="Unix datagram socket of a --serve daemon")
+    p.add_argument("--serve", action="store_true", help="Run as a batching daemon on --socket")
     p.add_argument("kv", nargs="*")
     args = p.parse_args()
 
-    record = {k: v for k, v in (kv.split("=", 1) for kv in args.kv)}
-    record.setdefault("ts", datetime.datetime.utcnow().isoformat() + "Z")
-    line = json.dumps(record, ensure_ascii=False)
-    with open(args.file, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+    if args.serve:
+        if not args.socket:
+            p.error("--serve requires --socket")
+        return serve(args.file, args.socket)
+    record = make_record(args.kv)  # validate and stamp ts here, whichever path writes
+    if args.socket and send(args.socket, record):
+        return 0
+
+    with open(args.file, "ab") as f:
+        f.write(dumps_line(record))
     return 0
 
 if __name__ == "__main__":
@@ -3,19 +3,48 @@
 from __future__ import annotations
 
 import argparse
+from array import array
+import codecs
 import datetime as _dt
 import hashlib
 import json
+import os
 from pathlib import Path
-import platform
-import subprocess
+import re
+import select
+import shlex
+import shutil
 import sys
-from typing import Any, Dict, Iterable, List, Tuple
-
-try:  # pragma: no cover - optional dependency
-    import yaml  # type: ignore
-except ModuleNotFoundError:  # pragma: no cover - optional dependency
-    yaml = None
+import threading
+from typing import Any, Dict, Iterable, List, Sequence, TextIO, Tuple
+
+# Optional dependencies are imported on first use (see load_yaml_module and
+# load_line_scanner) so --help and plan validation do not pay for them.
+_UNLOADED: Any = object()
+yaml: Any = _UNLOADED
+_YamlLoader: Any = None
+np: Any = None
+_scan_yaml_lines_jit: Any = _UNLOADED
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+YAML_CACHE_DIR = REPO_ROOT / ".cache" / "yaml"
+
+# Below this size the regex scan beats importing numba and loading the JIT.
+_JIT_SCAN_MIN_SIZE = 1 << 20
+# Line breaks recognised by str.splitlines(); "\r\n" counts as a single break.
+_EOL = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+# One match per line: leading spaces, text before any "#", then the rest.
+_YAML_LINE = re.compile(f"( *)([^#{_EOL}]*)[^{_EOL}]*(?:\r\n|[{_EOL}]|$)")
+_UNQUOTED_COLON = re.compile(r"""[:'"]""")
+# A single program with plain arguments: nothing the shell would interpret.
+_PLAIN_COMMAND = re.compile(r"[\w\-./]+(?:[ \t]+[\w\-./=:]+)*")
+# POSIX sh builtins; some also exist on PATH (echo, printf, kill, test...) but
+# behave differently there, so commands naming them keep going through /bin/sh.
+_SHELL_BUILTINS = frozenset(
+    "alias bg cd command echo eval exec exit export false fc fg getopts hash jobs kill "
+    "printf pwd read readonly return set shift test times trap true type ulimit umask "
+    "unalias unset wait".split()
+)
 
 
 class RunPlanError(Exception):
@@ -37,102 +66,246 @@ def parse_args(argv: Iterable[str]) -> argparse.Namespace:
     parser.add_argument("--plan", default="plan.yml", help="Path to plan YAML")
     parser.add_argument("--resume", action="store_true", help="Resume from previous run state")
     parser.add_argument("--safe-mode", action="store_true", help="Skip active actions")
-    return parser.parse_args(list(argv))
+    parser.add_argument(
+        "--pretty-status",
+        action="store_true",
+        help="Indent status JSON files for human inspection",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of targets processed concurrently",
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    return args
 
 
 def resolve_path(base: Path, candidate: str) -> Path:
-    path = Path(candidate)
-    if not path.is_absolute():
-        path = (base / candidate).resolve()
-    return path
+    # Joining is enough: an absolute candidate wins, and every caller only
+    # opens or creates the path, so symlinks need not be canonicalised.
+    return base / candidate
+
+
+def load_yaml_module() -> Any:
+    """Return the PyYAML module (None when missing), importing it once."""
+
+    global yaml, _YamlLoader
+    if yaml is _UNLOADED:
+        try:  # pragma: no cover - optional dependency
+            import yaml as module  # type: ignore
+        except ModuleNotFoundError:  # pragma: no cover - optional dependency
+            module = None
+        if module is not None:  # pragma: no cover - optional dependency
+            try:
+                from yaml import CSafeLoader as loader  # type: ignore
+            except ImportError:  # libyaml bindings not available
+                from yaml import SafeLoader as loader  # type: ignore
+            _YamlLoader = loader
+        yaml = module
+    return yaml
 
 
 def load_yaml(path: Path) -> Any:
     if not path.exists():
         raise RunPlanError(f"YAML file not found: {path}")
-    with path.open("r", encoding="utf-8") as handle:
-        text = handle.read()
-    if yaml is not None:
-        return yaml.safe_load(text) or {}
-    return simple_yaml_load(text)
+    stat = path.stat()
+    cache_key = f"{stat.st_mtime_ns}:{stat.st_size}"
+    cache_path = YAML_CACHE_DIR / (hashlib.sha1(str(path).encode("utf-8")).hexdigest() + ".json")
+    hit, value = read_yaml_cache(cache_path, cache_key)
+    if hit:
+        return value
+    yaml_module = load_yaml_module()
+    if yaml_module is not None:
+        # Byte stream: the loader reads it in chunks instead of a decoded copy.
+        with path.open("rb") as handle:
+            value = yaml_module.load(handle, Loader=_YamlLoader) or {}
+    else:
+        with path.open("r", encoding="utf-8", buffering=64 * 1024) as handle:
+            value = simple_yaml_load(handle.read())
+    write_yaml_cache(cache_path, cache_key, value)
+    return value
+
+
+def read_yaml_cache(cache_path: Path, cache_key: str) -> Tuple[bool, Any]:
+    try:
+        with cache_path.open("r", encoding="utf-8") as handle:
+            if handle.readline().rstrip("\n") != cache_key:
+                return False, None
+            return True, json.loads(handle.read())
+    except (OSError, json.JSONDecodeError):
+        return False, None
+
+
+def has_only_str_keys(value: Any) -> bool:
+    """Return True when every mapping in ``value`` is keyed by strings.
+
+    JSON turns other keys (YAML ints, booleans such as ``on:``) into strings,
+    so such documents would not load back identical from the cache.
+    """
+
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, dict):
+            if not all(isinstance(key, str) for key in item):
+                return False
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+    return True
+
+
+def write_yaml_cache(cache_path: Path, cache_key: str, value: Any) -> None:
+    if not has_only_str_keys(value):
+        return
+    try:
+        payload = json.dumps(value, ensure_ascii=False)
+    except (TypeError, ValueError):  # e.g. YAML timestamps, not JSON-serializable
+        return
+    try:
+        ensure_dir(cache_path.parent)
+        tmp = cache_path.with_suffix(cache_path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as handle:
+            handle.write(cache_key + "\n")
+            handle.write(payload)
+        tmp.replace(cache_path)
+    except OSError:  # pragma: no cover - cache is best effort only
+        pass
 
 
 def simple_yaml_load(text: str) -> Any:
     tokens = tokenize_yaml(text)
     if not tokens:
         return {}
-    value, index = parse_yaml_block(tokens, 0, tokens[0][0])
-    if index != len(tokens):
+    # Structure-of-arrays view of the tokens, with the list-item test done once.
+    indents = array("i", [indent for indent, _ in tokens])
+    contents = [content for _, content in tokens]
+    items = [content.startswith("- ") for content in contents]
+    total = len(contents)
+    value, index = parse_yaml_block(indents, contents, items, 0)
+    if index != total:
         # consume remaining blocks if present at root
         remainder: Dict[str, Any] = {}
         if isinstance(value, dict):
             remainder.update(value)
         elif value is not None:
             return value
-        while index < len(tokens):
-            chunk, index = parse_yaml_block(tokens, index, tokens[index][0])
+        while index < total:
+            chunk, index = parse_yaml_block(indents, contents, items, index)
             if isinstance(chunk, dict):
                 remainder.update(chunk)
         return remainder
     return value
 
 
+def _scan_yaml_lines(buf: Any, starts: Any, lens: Any, indents: Any) -> int:
+    """Byte-level equivalent of the ``_YAML_LINE`` scan for ASCII input.
+
+    Fills ``starts``/``lens``/``indents`` with the stripped pre-comment content
+    of every non-empty line and returns how many lines were emitted.  Written
+    in the numeric subset understood by Numba, which compiles it when present.
+    """
+
+    size = len(buf)
+    count = 0
+    i = 0
+    while i < size:
+        indent = 0
+        while i < size and buf[i] == 32:
+            indent += 1
+            i += 1
+        start = i
+        # "#" or a str.splitlines() break: \n \v \f \r \x1c \x1d \x1e
+        while i < size and buf[i] != 35 and not (10 <= buf[i] <= 13 or 28 <= buf[i] <= 30):
+            i += 1
+        end = i
+        while i < size and not (10 <= buf[i] <= 13 or 28 <= buf[i] <= 30):
+            i += 1
+        if i < size:
+            if buf[i] == 13 and i + 1 < size and buf[i + 1] == 10:
+                i += 1
+            i += 1
+        # str.strip() whitespace: \t-\r, \x1c-\x1f and space
+        while start < end and (9 <= buf[start] <= 13 or 28 <= buf[start] <= 32):
+            start += 1
+        while end > start and (9 <= buf[end - 1] <= 13 or 28 <= buf[end - 1] <= 32):
+            end -= 1
+        if end > start:
+            starts[count] = start
+            lens[count] = end - start
+            indents[count] = indent
+            count += 1
+    return count
+
+
+def load_line_scanner() -> Any:
+    """Return the Numba-compiled ``_scan_yaml_lines`` (None without numba)."""
+
+    global np, _scan_yaml_lines_jit
+    if _scan_yaml_lines_jit is _UNLOADED:
+        try:  # pragma: no cover - optional dependency
+            import numba  # type: ignore
+            import numpy
+        except ModuleNotFoundError:  # pragma: no cover - optional dependency
+            _scan_yaml_lines_jit = None
+        else:  # pragma: no cover - optional dependency
+            np = numpy
+            _scan_yaml_lines_jit = numba.njit(cache=True)(_scan_yaml_lines)
+    return _scan_yaml_lines_jit
+
+
 def tokenize_yaml(text: str) -> List[Tuple[int, str]]:
+    scanner = None
+    if len(text) >= _JIT_SCAN_MIN_SIZE and text.isascii():
+        scanner = load_line_scanner()
+    if scanner is not None:  # pragma: no cover - needs numba
+        # Byte offsets equal str offsets for ASCII text.
+        buf = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        # One slot per line: at most one more than the number of line breaks.
+        slots = int(np.count_nonzero(((buf >= 10) & (buf <= 13)) | ((buf >= 28) & (buf <= 30)))) + 1
+        starts = np.empty(slots, dtype=np.int64)
+        lens = np.empty(slots, dtype=np.int64)
+        indents = np.empty(slots, dtype=np.int64)
+        count = scanner(buf, starts, lens, indents)
+        return [
+            (indent, text[start : start + length])
+            for start, length, indent in zip(
+                starts[:count].tolist(), lens[:count].tolist(), indents[:count].tolist()
+            )
+        ]
     tokens: List[Tuple[int, str]] = []
-    for raw_line in text.splitlines():
-        stripped_comment = raw_line.split("#", 1)[0].rstrip("\n")
-        stripped = stripped_comment.rstrip()
-        if not stripped.strip():
-            continue
-        indent = len(stripped_comment) - len(stripped_comment.lstrip(" "))
-        tokens.append((indent, stripped.strip()))
+    for match in _YAML_LINE.finditer(text):
+        content = match.group(2).strip()
+        if content:
+            tokens.append((len(match.group(1)), content))
     return tokens
 
 
-def parse_yaml_block(tokens: List[Tuple[int, str]], index: int, indent: int) -> Tuple[Any, int]:
-    if index >= len(tokens):
-        return {}, index
-    current_indent, content = tokens[index]
-    if current_indent < indent:
-        return {}, index
-    if content.startswith("- "):
-        return parse_yaml_list(tokens, index, indent)
-    return parse_yaml_dict(tokens, index, indent)
-
-
-def parse_yaml_list(tokens: List[Tuple[int, str]], index: int, indent: int) -> Tuple[List[Any], int]:
-    result: List[Any] = []
-    while index < len(tokens):
-        current_indent, content = tokens[index]
-        if current_indent < indent or not content.startswith("- "):
-            break
-        item_content = content[2:].strip()
-        index += 1
-        pending_key: str | None = None
-        inline_has_value = False
-        if item_content:
-            if (
-                has_unquoted_colon(item_content)
-                and not item_content.startswith("{")
-                and not item_content.startswith("[")
-            ):
-                key, value_part = item_content.split(":", 1)
-                pending_key = key.strip()
-                value_part = value_part.strip()
-                if value_part:
-                    value: Any = {pending_key: parse_scalar(value_part)}
-                    inline_has_value = True
-                else:
-                    value = {pending_key: None}
-            else:
-                value = parse_scalar(item_content)
-        else:
-            value = None
-
-        if index < len(tokens):
-            next_indent, _ = tokens[index]
-            if next_indent > current_indent:
-                nested, index = parse_yaml_block(tokens, index, next_indent)
+def parse_yaml_block(
+    indents: Sequence[int], contents: List[str], items: List[bool], index: int
+) -> Tuple[Any, int]:
+    """Parse the list or mapping starting at ``index``.
+
+    Nesting is tracked with an explicit stack of frames instead of recursion.
+    A frame is ``[is_list, container, indent, value, pending_key, inline]``;
+    the last three fields hold the entry waiting for its nested block.
+    """
+
+    total = len(contents)
+    stack: List[List[Any]] = []
+    frame: List[Any] = [items[index], [] if items[index] else {}, indents[index], None, None, False]
+    while True:
+        is_list, container, indent = frame[0], frame[1], frame[2]
+        if index >= total or indents[index] < indent or items[index] is not is_list:
+            if not stack:
+                return container, index
+            nested = container
+            frame = stack.pop()
+            if frame[0]:
+                value, pending_key, inline_has_value = frame[3], frame[4], frame[5]
                 if pending_key and not inline_has_value:
                     if not isinstance(value, dict):
                         value = {}
@@ -143,61 +316,94 @@ def parse_yaml_list(tokens: List[Tuple[int, str]], index: int, indent: int) -> T
                     value = nested
                 elif nested is not None:
                     value = nested
-        result.append(value)
-    return result, index
-
-
-def parse_yaml_dict(tokens: List[Tuple[int, str]], index: int, indent: int) -> Tuple[Dict[str, Any], int]:
-    result: Dict[str, Any] = {}
-    while index < len(tokens):
-        current_indent, content = tokens[index]
-        if current_indent < indent or content.startswith("- "):
-            break
-        if ":" not in content:
-            raise RunPlanError(f"Unable to parse line: {content}")
-        key, value_part = content.split(":", 1)
-        key = key.strip()
-        value_part = value_part.strip()
+                frame[1].append(value)
+            else:
+                frame[1][frame[4]] = nested
+            continue
+
+        current_indent = indents[index]
+        content = contents[index]
         index += 1
-        if value_part:
-            value = parse_scalar(value_part)
-        else:
-            if index < len(tokens):
-                next_indent, _ = tokens[index]
-                if next_indent > current_indent:
-                    value, index = parse_yaml_block(tokens, index, next_indent)
+        if is_list:
+            item_content = content[2:].strip()
+            pending_key: str | None = None
+            inline_has_value = False
+            if item_content:
+                if has_unquoted_colon(item_content) and item_content[0] not in "{[":
+                    key, value_part = item_content.split(":", 1)
+                    pending_key = key.strip()
+                    value_part = value_part.strip()
+                    if value_part:
+                        value: Any = {pending_key: parse_scalar(value_part)}
+                        inline_has_value = True
+                    else:
+                        value = {pending_key: None}
                 else:
-                    value = None
+                    value = parse_scalar(item_content)
             else:
                 value = None
-        result[key] = value
-    return result, index
+            if index < total and indents[index] > current_indent:
+                frame[3], frame[4], frame[5] = value, pending_key, inline_has_value
+            else:
+                container.append(value)
+                continue
+        else:
+            if ":" not in content:
+                raise RunPlanError(f"Unable to parse line: {content}")
+            key, value_part = content.split(":", 1)
+            key = key.strip()
+            value_part = value_part.strip()
+            if value_part:
+                container[key] = parse_scalar(value_part)
+                continue
+            if index < total and indents[index] > current_indent:
+                frame[4] = key
+            else:
+                container[key] = None
+                continue
+
+        stack.append(frame)
+        frame = [items[index], [] if items[index] else {}, indents[index], None, None, False]
+
+
+_MISSING: Any = object()
+_SCALAR_CONSTANTS: Dict[str, Any] = {
+    "true": True,
+    "yes": True,
+    "on": True,
+    "false": False,
+    "no": False,
+    "off": False,
+    "null": None,
+    "none": None,
+    "~": None,
+}
+# First characters that may start an int()/float() literal (int() skips whitespace).
+_NUMERIC_START = frozenset("0123456789-+. \t\n\r\v\f\x1c\x1d\x1e\x1f")
+_JSON_CLOSE = {"[": "]", "{": "}"}
 
 
 def parse_scalar(value: str) -> Any:
     if not value:
         return ""
-    if value[0] in {'"', "'"} and value[-1:] == value[0]:
+    first = value[0]
+    if (first == '"' or first == "'") and value[-1] == first:
         inner = value[1:-1]
-        if value[0] == '"':
+        if first == '"':
             return bytes(inner, "utf-8").decode("unicode_escape")
         return inner.replace("''", "'")
-    lowered = value.lower()
-    if lowered in {"true", "yes", "on"}:
-        return True
-    if lowered in {"false", "no", "off"}:
-        return False
-    if lowered in {"null", "none", "~"}:
-        return None
-    try:
-        if any(ch in value for ch in ".eE"):
-            return float(value)
-        return int(value)
-    except ValueError:
-        pass
-    if (value.startswith("[") and value.endswith("]")) or (
-        value.startswith("{") and value.endswith("}")
-    ):
+    constant = _SCALAR_CONSTANTS.get(value.lower(), _MISSING)
+    if constant is not _MISSING:
+        return constant
+    # int() also accepts non-ASCII decimal digits, hence the isascii() escape.
+    if first in _NUMERIC_START or not first.isascii():
+        try:
+            if "." in value or "e" in value or "E" in value:
+                return float(value)
+            return int(value)
+        except ValueError:
+            return value
+    if _JSON_CLOSE.get(first) == value[-1]:
         try:
             return json.loads(value)
         except json.JSONDecodeError:
@@ -254,7 +460,8 @@ def in_safe_window(now: _dt.datetime, windows: Iterable[Tuple[_dt.time, _dt.time
 def has_unquoted_colon(text: str) -> bool:
     in_single = False
     in_double = False
-    for ch in text:
+    for match in _UNQUOTED_COLON.finditer(text):
+        ch = match.group()
         if ch == "'" and not in_double:
             in_single = not in_single
         elif ch == '"' and not in_single:
@@ -269,41 +476,99 @@ def ensure_dir(path: Path) -> None:
 
 
 def iso_now() -> str:
-    return _dt.datetime.utcnow().isoformat() + "Z"
+    return _dt.datetime.now(_dt.timezone.utc).isoformat().replace("+00:00", "Z")
 
 
-def compute_target_id(target: Dict[str, Any]) -> str:
-    bssid = str(target.get("BSSID") or target.get("bssid") or "").strip()
-    ssid = str(target.get("SSID") or target.get("ssid") or "").strip()
-    canal = str(target.get("canal") or target.get("channel") or "").strip()
-    window = str(
-        target.get("timestamp-window")
-        or target.get("timestamp_window")
-        or target.get("window")
-        or ""
-    ).strip()
+def target_field(target: Dict[str, Any], keys: Tuple[str, ...]) -> str:
+    for key in keys:
+        value = target.get(key)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+def target_identity(target: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    bssid = target_field(target, ("BSSID", "bssid"))
+    ssid = target_field(target, ("SSID", "ssid"))
+    canal = target_field(target, ("canal", "channel"))
+    window = target_field(target, ("timestamp-window", "timestamp_window", "window"))
     if not all([bssid, ssid, canal, window]):
         raise RunPlanError(
             "Target missing one of required fields (BSSID, SSID, canal, timestamp-window)",
             extra={"target": target},
         )
-    digest = hashlib.sha1(f"{bssid}|{ssid}|{canal}|{window}".encode("utf-8")).hexdigest()
-    return digest
+    return bssid, ssid, canal, window
 
 
-def gather_versions(repo_root: Path, plan_data: Dict[str, Any]) -> Dict[str, Any]:
-    versions: Dict[str, Any] = {
-        "python": platform.python_version(),
-        "platform": platform.platform(),
-    }
+def compute_target_id(target: Dict[str, Any]) -> str:
+    fields = target_identity(target)
+    return hashlib.blake2b(
+        b"|".join(field.encode("utf-8") for field in fields), digest_size=16
+    ).hexdigest()
+
+
+def legacy_target_id(target: Dict[str, Any]) -> str:
+    """SHA-1 target id used before BLAKE2b; only consulted to migrate status files."""
+
+    return hashlib.sha1("|".join(target_identity(target)).encode("utf-8")).hexdigest()
+
+
+_GIT_SHA = re.compile(r"[0-9a-f]{40}(?:[0-9a-f]{24})?")
+# repo_root -> python/platform/git versions; none of them change during a run.
+_VERSIONS_CACHE: Dict[Path, Dict[str, Any]] = {}
+
+
+def read_git_head(repo_root: Path) -> str | None:
+    """Resolve HEAD from the .git directory without running git (None if unsure)."""
+
+    git_dir = repo_root / ".git"
     try:
-        git_rev = (
-            subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo_root, text=True)
-            .strip()
-        )
-        versions["git"] = git_rev
-    except Exception:  # pragma: no cover - best effort only
-        pass
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:  # no repository, or .git is a worktree/submodule file
+        return None
+    if head.startswith("ref: "):
+        ref = head[5:].strip()
+        try:
+            head = (git_dir / ref).read_text(encoding="utf-8").strip()
+        except OSError:
+            try:
+                packed = (git_dir / "packed-refs").read_text(encoding="utf-8")
+            except OSError:
+                return None
+            for line in packed.splitlines():
+                sha, _, name = line.partition(" ")
+                if name == ref:
+                    head = sha
+                    break
+            else:
+                return None
+    return head if _GIT_SHA.fullmatch(head) else None
+
+
+def gather_versions(repo_root: Path, plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    cached = _VERSIONS_CACHE.get(repo_root)
+    if cached is None:
+        import platform
+
+        cached = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        }
+        git_rev = read_git_head(repo_root)
+        if git_rev is None:
+            import subprocess
+
+            try:
+                git_rev = (
+                    subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo_root, text=True)
+                    .strip()
+                )
+            except Exception:  # pragma: no cover - best effort only
+                pass
+        if git_rev:
+            cached["git"] = git_rev
+        _VERSIONS_CACHE[repo_root] = cached
+    versions = dict(cached)
     plan_version = plan_data.get("version")
     if plan_version:
         versions["plan"] = plan_version
@@ -311,23 +576,75 @@ def gather_versions(repo_root: Path, plan_data: Dict[str, Any]) -> Dict[str, Any
 
 
 def read_status(path: Path) -> Dict[str, Any]:
+    status: Dict[str, Any] = {}
     if path.exists():
         with path.open("r", encoding="utf-8") as handle:
             try:
-                return json.load(handle)
+                status = json.load(handle)
             except json.JSONDecodeError:
-                return {}
-    return {}
+                status = {}
+    stage_sets(status)
+    return status
 
 
-def write_status(path: Path, data: Dict[str, Any]) -> None:
+def stage_sets(status: Dict[str, Any]) -> Tuple[set, set]:
+    """Return the in-memory completed/skipped sets, building them on first use.
+
+    The ``completed``/``skipped`` lists stay the on-disk form; the
+    ``_``-prefixed shadow sets only serve membership tests and are never
+    written.
+    """
+
+    completed_set = status.get("_completed_set")
+    if completed_set is None:
+        completed_set = status["_completed_set"] = set(status.get("completed", []))
+    skipped_set = status.get("_skipped_set")
+    if skipped_set is None:
+        skipped_set = status["_skipped_set"] = set(status.get("skipped", []))
+    return completed_set, skipped_set
+
+
+def write_status(path: Path, data: Dict[str, Any], *, pretty: bool = False) -> None:
+    data = {key: value for key, value in data.items() if not key.startswith("_")}
     ensure_dir(path.parent)
     tmp = path.with_suffix(path.suffix + ".tmp")
     with tmp.open("w", encoding="utf-8") as handle:
-        json.dump(data, handle, ensure_ascii=False, indent=2)
+        if pretty:
+            json.dump(data, handle, ensure_ascii=False, indent=2)
+        else:
+            json.dump(data, handle, ensure_ascii=False, separators=(",", ":"))
     tmp.replace(path)
 
 
+class JsonlWriter:
+    """Append JSON lines to a log file kept open (line buffered) for a run.
+
+    Writes are serialized with a lock so concurrent targets never interleave.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._handle: TextIO | None = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "JsonlWriter":
+        self._handle = self.path.open("a", encoding="utf-8", buffering=1)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        if self._handle is None:
+            raise RunPlanError(f"JSONL writer is not open: {self.path}")
+        line = json.dumps(payload, ensure_ascii=False)
+        with self._lock:
+            self._handle.write(line)
+            self._handle.write("\n")
+
+
 def write_jsonl(path: Path, payload: Dict[str, Any]) -> None:
     ensure_dir(path.parent)
     with path.open("a", encoding="utf-8") as handle:
@@ -348,6 +665,9 @@ def stage_list(target: Dict[str, Any]) -> List[Dict[str, Any]]:
             out.append(entry)
         return out
     if isinstance(stages, list):
+        # Common case: already canonical, hand the plan's own list back.
+        if all(isinstance(stage, dict) and "name" in stage for stage in stages):
+            return stages
         normalized: List[Dict[str, Any]] = []
         for idx, stage in enumerate(stages):
             if isinstance(stage, str):
@@ -365,6 +685,37 @@ def stage_list(target: Dict[str, Any]) -> List[Dict[str, Any]]:
     raise RunPlanError("Unsupported stage format", extra={"stages": stages})
 
 
+def normalize_argv(stage: Dict[str, Any]) -> List[str] | None:
+    argv = stage.get("argv")
+    if argv is None:
+        return None
+    if not isinstance(argv, list) or not argv:
+        raise RunPlanError("Stage 'argv' must be a non-empty list", extra={"stage": stage})
+    return [str(arg) for arg in argv]
+
+
+def missing_requirements(repo_root: Path, stage: Dict[str, Any]) -> List[str]:
+    requires = stage.get("requires") or []
+    if not isinstance(requires, list):
+        raise RunPlanError("Stage 'requires' must be a list", extra={"stage": stage})
+    return [str(entry) for entry in requires if not (repo_root / str(entry)).is_file()]
+
+
+def plain_command_argv(cmd: str, repo_root: Path) -> List[str] | None:
+    """Split ``cmd`` when it can run without ``/bin/sh``, else return None."""
+
+    if not _PLAIN_COMMAND.fullmatch(cmd):
+        return None
+    args = cmd.split()
+    program = args[0]
+    if "/" in program:
+        if not os.access(repo_root / program, os.X_OK):
+            return None
+    elif program in _SHELL_BUILTINS or shutil.which(program) is None:
+        return None
+    return args
+
+
 def normalize_cmd(stage: Dict[str, Any]) -> str:
     cmd = stage.get("cmd")
     if cmd is None:
@@ -393,22 +744,24 @@ def acquire_lock(lock_path: Path) -> None:
 
 
 def log_stage_event(
-    log_path: Path,
+    log_writer: JsonlWriter,
     stage_name: str,
     target_id: str,
     cmd: str,
     versions: Dict[str, Any],
+    *,
+    ts: str | None = None,
     **extra: Any,
 ) -> None:
     payload = {
-        "ts": iso_now(),
+        "ts": ts or iso_now(),
         "stage": stage_name,
         "target_id": target_id,
         "cmd": cmd,
         "versions": versions,
     }
     payload.update(extra)
-    write_jsonl(log_path, payload)
+    log_writer.write(payload)
 
 
 def update_status(
@@ -418,25 +771,32 @@ def update_status(
     status: Dict[str, Any],
     *,
     reason: str | None = None,
+    ts: str | None = None,
+    pretty: bool = False,
 ) -> Dict[str, Any]:
-    completed: List[str] = list(status.get("completed", []))
-    skipped: List[str] = list(status.get("skipped", []))
+    ts = ts or iso_now()
+    completed_set, skipped_set = stage_sets(status)
+    completed: List[str] = status.setdefault("completed", [])
+    skipped: List[str] = status.setdefault("skipped", [])
     errors: Dict[str, Any] = status.get("errors", {})
 
     if state == "completed":
-        if stage_name not in completed:
+        if stage_name not in completed_set:
+            completed_set.add(stage_name)
             completed.append(stage_name)
-        if stage_name in skipped:
+        if stage_name in skipped_set:
+            skipped_set.discard(stage_name)
             skipped.remove(stage_name)
         errors.pop(stage_name, None)
         status_state = "in_progress"
     elif state == "skipped":
-        if stage_name not in skipped:
+        if stage_name not in skipped_set:
+            skipped_set.add(stage_name)
             skipped.append(stage_name)
         errors.pop(stage_name, None)
         status_state = "in_progress"
     elif state == "error":
-        errors[stage_name] = {"ts": iso_now(), "reason": reason or ""}
+        errors[stage_name] = {"ts": ts, "reason": reason or ""}
         status_state = "error"
     else:
         status_state = status.get("state", "pending")
@@ -448,96 +808,258 @@ def update_status(
             "errors": errors,
             "last_stage": stage_name,
             "state": status_state,
-            "updated_at": iso_now(),
+            "updated_at": ts,
         }
     )
-    write_status(status_path, status)
+    write_status(status_path, status, pretty=pretty)
     return status
 
 
+def stream_command(
+    args: List[str] | str,
+    repo_root: Path,
+    log_writer: JsonlWriter,
+    stage_name: str,
+    target_id: str,
+    cmd: str,
+    versions: Dict[str, Any],
+) -> int:
+    """Run a command and log its output as it arrives instead of buffering it."""
+
+    import subprocess
+
+    process = subprocess.Popen(
+        args,
+        shell=isinstance(args, str),
+        cwd=repo_root,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    assert process.stdout is not None and process.stderr is not None
+    streams = {
+        process.stdout.fileno(): ("stdout", codecs.getincrementaldecoder("utf-8")("replace")),
+        process.stderr.fileno(): ("stderr", codecs.getincrementaldecoder("utf-8")("replace")),
+    }
+    try:
+        while streams:
+            ready, _, _ = select.select(list(streams), [], [])
+            for fd in ready:
+                name, decoder = streams[fd]
+                chunk = os.read(fd, 65536)
+                data = decoder.decode(chunk, final=not chunk)
+                if data:
+                    log_stage_event(
+                        log_writer,
+                        stage_name,
+                        target_id,
+                        cmd,
+                        versions,
+                        event="output",
+                        stream=name,
+                        data=data,
+                    )
+                if not chunk:
+                    del streams[fd]
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+    return process.wait()
+
+
 def run_stage(
     repo_root: Path,
     stage: Dict[str, Any],
     target_id: str,
     status_path: Path,
     status: Dict[str, Any],
-    log_path: Path,
+    log_writer: JsonlWriter,
     versions: Dict[str, Any],
     safe_mode: bool,
-) -> None:
+    *,
+    pretty_status: bool = False,
+) -> Dict[str, Any]:
     stage_name = str(stage["name"])
-    cmd = normalize_cmd(stage)
+    argv = normalize_argv(stage)
+    cmd = shlex.join(argv) if argv is not None else normalize_cmd(stage)
     active = bool(stage.get("active", False))
-    already_completed = stage_name in status.get("completed", [])
-    already_skipped = stage_name in status.get("skipped", [])
+    completed_set, skipped_set = stage_sets(status)
+    already_completed = stage_name in completed_set
+    already_skipped = stage_name in skipped_set
 
     if already_completed or already_skipped:
-        return
+        return status
 
     if safe_mode and active:
+        ts = iso_now()
         log_stage_event(
-            log_path,
+            log_writer,
             stage_name,
             target_id,
             cmd,
             versions,
+            ts=ts,
             event="skipped",
             skipped=True,
             reason="safe-mode",
         )
-        update_status(status_path, stage_name, "skipped", status, reason="safe-mode")
-        return
+        return update_status(
+            status_path,
+            stage_name,
+            "skipped",
+            status,
+            reason="safe-mode",
+            ts=ts,
+            pretty=pretty_status,
+        )
+
+    missing = missing_requirements(repo_root, stage)
+    if missing:
+        ts = iso_now()
+        log_stage_event(
+            log_writer,
+            stage_name,
+            target_id,
+            cmd,
+            versions,
+            ts=ts,
+            event="skipped",
+            skipped=True,
+            reason="missing-files",
+            missing=missing,
+            message=stage.get("skip_message", ""),
+        )
+        return update_status(
+            status_path,
+            stage_name,
+            "skipped",
+            status,
+            reason="missing-files",
+            ts=ts,
+            pretty=pretty_status,
+        )
 
-    log_stage_event(log_path, stage_name, target_id, cmd, versions, event="start")
+    import subprocess
 
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        cwd=repo_root,
-        capture_output=True,
-        text=True,
-    )
+    if argv is None:
+        argv = plain_command_argv(cmd, repo_root)
+    stream_output = bool(stage.get("stream_output", False))
+
+    log_stage_event(log_writer, stage_name, target_id, cmd, versions, event="start")
 
-    if result.returncode != 0:
+    result = None
+    try:
+        if stream_output:
+            returncode = stream_command(
+                argv if argv is not None else cmd,
+                repo_root,
+                log_writer,
+                stage_name,
+                target_id,
+                cmd,
+                versions,
+            )
+        else:
+            result = subprocess.run(
+                argv if argv is not None else cmd,
+                shell=argv is None,
+                cwd=repo_root,
+                capture_output=True,
+            )
+            returncode = result.returncode
+    except OSError as exc:
+        ts = iso_now()
+        log_stage_event(
+            log_writer,
+            stage_name,
+            target_id,
+            cmd,
+            versions,
+            ts=ts,
+            event="error",
+            error=str(exc),
+        )
+        update_status(
+            status_path,
+            stage_name,
+            "error",
+            status,
+            reason="stage failed",
+            ts=ts,
+            pretty=pretty_status,
+        )
+        raise StageExecutionError(
+            f"Stage '{stage_name}' could not be started: {exc}",
+            extra={"target_id": target_id, "stage": stage_name},
+        ) from exc
+
+    if returncode != 0:
+        stdout = stderr = ""
+        if result is not None:  # streamed output was already logged
+            stdout = result.stdout.decode("utf-8", errors="replace")
+            stderr = result.stderr.decode("utf-8", errors="replace")
+        ts = iso_now()
         log_stage_event(
-            log_path,
+            log_writer,
             stage_name,
             target_id,
             cmd,
             versions,
+            ts=ts,
             event="error",
-            returncode=result.returncode,
-            stdout=result.stdout,
-            stderr=result.stderr,
+            returncode=returncode,
+            stdout=stdout,
+            stderr=stderr,
+        )
+        update_status(
+            status_path,
+            stage_name,
+            "error",
+            status,
+            reason="stage failed",
+            ts=ts,
+            pretty=pretty_status,
         )
-        update_status(status_path, stage_name, "error", status, reason="stage failed")
         raise StageExecutionError(
-            f"Stage '{stage_name}' failed with exit code {result.returncode}",
+            f"Stage '{stage_name}' failed with exit code {returncode}",
             extra={
                 "target_id": target_id,
                 "stage": stage_name,
-                "returncode": result.returncode,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
+                "returncode": returncode,
+                "stdout": stdout,
+                "stderr": stderr,
             },
         )
 
+    ts = iso_now()
     log_stage_event(
-        log_path,
+        log_writer,
         stage_name,
         target_id,
         cmd,
         versions,
+        ts=ts,
         event="completed",
-        returncode=result.returncode,
+        returncode=returncode,
+    )
+    return update_status(
+        status_path,
+        stage_name,
+        "completed",
+        status,
+        ts=ts,
+        pretty=pretty_status,
     )
-    update_status(status_path, stage_name, "completed", status)
 
 
-def finalize_status(status_path: Path, status: Dict[str, Any]) -> None:
+def finalize_status(
+    status_path: Path,
+    status: Dict[str, Any],
+    *,
+    pretty: bool = False,
+) -> None:
     if status.get("state") != "error":
         status.update({"state": "completed", "completed_at": iso_now()})
-        write_status(status_path, status)
+        write_status(status_path, status, pretty=pretty)
 
 
 def process_target(
@@ -545,44 +1067,98 @@ def process_target(
     target: Dict[str, Any],
     *,
     status_dir: Path,
-    log_path: Path,
+    log_writer: JsonlWriter,
     locks_dir: Path,
     versions: Dict[str, Any],
     resume: bool,
     safe_mode: bool,
+    pretty_status: bool = False,
 ) -> None:
     target_id = compute_target_id(target)
     lock_path = locks_dir / f"{target_id}.lock"
 
     acquire_lock(lock_path)
+    status_path = status_dir / f"{target_id}.json"
     try:
-        status_path = status_dir / f"{target_id}.json"
         if not resume and status_path.exists():
             status_path.unlink()
+        if resume and not status_path.exists():
+            legacy_status = status_dir / f"{legacy_target_id(target)}.json"
+            if legacy_status.exists():
+                legacy_status.replace(status_path)
         status = read_status(status_path)
         stages = stage_list(target)
         for stage in stages:
-            run_stage(
+            status = run_stage(
                 repo_root,
                 stage,
                 target_id,
                 status_path,
                 status,
-                log_path,
+                log_writer,
                 versions,
                 safe_mode,
+                pretty_status=pretty_status,
             )
-            status = read_status(status_path)
-        finalize_status(status_path, status)
+        finalize_status(status_path, status, pretty=pretty_status)
     finally:
         remove_lock(lock_path)
 
 
+def run_target(
+    repo_root: Path,
+    target: Any,
+    *,
+    status_dir: Path,
+    log_writer: JsonlWriter,
+    locks_dir: Path,
+    versions: Dict[str, Any],
+    resume: bool,
+    safe_mode: bool,
+    pretty_status: bool = False,
+) -> RunPlanError | None:
+    """Process one target, logging and returning its error instead of raising."""
+
+    try:
+        if not isinstance(target, dict):
+            raise RunPlanError("Each target must be a mapping", extra={"target": target})
+        process_target(
+            repo_root,
+            target,
+            status_dir=status_dir,
+            log_writer=log_writer,
+            locks_dir=locks_dir,
+            versions=versions,
+            resume=resume,
+            safe_mode=safe_mode,
+            pretty_status=pretty_status,
+        )
+    except RunPlanError as exc:
+        err_payload = {
+            "ts": iso_now(),
+            "event": "error",
+            "message": str(exc),
+            "extra": exc.extra,
+        }
+        log_writer.write(err_payload)
+        print(json.dumps(err_payload, ensure_ascii=False), file=sys.stderr)
+        return exc
+    except Exception as exc:  # pragma: no cover - defensive
+        err_payload = {
+            "ts": iso_now(),
+            "event": "error",
+            "message": str(exc),
+        }
+        log_writer.write(err_payload)
+        print(json.dumps(err_payload, ensure_ascii=False), file=sys.stderr)
+        return RunPlanError(str(exc))
+    return None
+
+
 def run(argv: Iterable[str]) -> int:
     args = parse_args(argv)
 
-    script_path = Path(__file__).resolve()
-    repo_root = script_path.parents[2]
+    repo_root = REPO_ROOT
 
     config_path = resolve_path(repo_root, args.config)
     plan_path = resolve_path(repo_root, args.plan)
@@ -621,40 +1197,38 @@ def run(argv: Iterable[str]) -> int:
     versions = gather_versions(repo_root, plan_data if isinstance(plan_data, dict) else {})
 
     errors: List[RunPlanError] = []
-    for target in targets:
-        try:
-            if not isinstance(target, dict):
-                raise RunPlanError("Each target must be a mapping", extra={"target": target})
-            process_target(
-                repo_root,
-                target,
-                status_dir=status_dir,
-                log_path=log_file,
-                locks_dir=locks_dir,
-                versions=versions,
-                resume=args.resume,
-                safe_mode=safe_mode_effective,
-            )
-        except RunPlanError as exc:
-            errors.append(exc)
-            err_payload = {
-                "ts": iso_now(),
-                "event": "error",
-                "message": str(exc),
-                "extra": exc.extra,
-            }
-            write_jsonl(log_file, err_payload)
-            print(json.dumps(err_payload, ensure_ascii=False), file=sys.stderr)
-        except Exception as exc:  # pragma: no cover - defensive
-            err = RunPlanError(str(exc))
-            errors.append(err)
-            err_payload = {
-                "ts": iso_now(),
-                "event": "error",
-                "message": str(exc),
-            }
-            write_jsonl(log_file, err_payload)
-            print(json.dumps(err_payload, ensure_ascii=False), file=sys.stderr)
+    with JsonlWriter(log_file) as log_writer:
+        target_options: Dict[str, Any] = {
+            "status_dir": status_dir,
+            "log_writer": log_writer,
+            "locks_dir": locks_dir,
+            "versions": versions,
+            "resume": args.resume,
+            "safe_mode": safe_mode_effective,
+            "pretty_status": args.pretty_status,
+        }
+        if args.jobs == 1:
+            for target in targets:
+                error = run_target(repo_root, target, **target_options)
+                if error is not None:
+                    errors.append(error)
+        else:
+            from concurrent.futures import ThreadPoolExecutor, as_completed
+
+            with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+                futures = [
+                    executor.submit(run_target, repo_root, target, **target_options)
+                    for target in targets
+                ]
+                try:
+                    for future in as_completed(futures):
+                        error = future.result()
+                        if error is not None:
+                            errors.append(error)
+                except KeyboardInterrupt:
+                    # Drop queued targets; otherwise __exit__ would still run them all.
+                    executor.shutdown(cancel_futures=True)
+                    raise
 
     if errors:
         return max(error.code for error in errors)
@@ -662,9 +1236,7 @@ def run(argv: Iterable[str]) -> int:
 
 
 def emit_terminal_error(exc: RunPlanError | Exception) -> int:
-    script_path = Path(__file__).resolve()
-    repo_root = script_path.parents[2]
-    logs_dir = repo_root / "logs"
+    logs_dir = REPO_ROOT / "logs"
     ensure_dir(logs_dir)
     error_log = logs_dir / "run_plan.errors.jsonl"
     payload = {